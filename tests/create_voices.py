@@ -2,6 +2,9 @@ import numpy as np
 import wave
 import pyttsx3
 import os
+import shutil
+from functools import lru_cache
+from math import gcd
 from tempfile import NamedTemporaryFile
 import scipy.signal
 
@@ -10,6 +13,40 @@ engine = pyttsx3.init()
 engine.setProperty('rate', 140)  # slower speech for better recognition
 engine.setProperty('voice', 'english')  # default English voice
 
+@lru_cache(maxsize=None)
+def _get_poly_filter(up, down):
+    """Design the same polyphase low-pass filter as scipy.signal.resample_poly.
+
+    Returns the zero-padded taps and the number of leading output samples to drop.
+    """
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    h = scipy.signal.firwin(2 * half_len + 1, 1.0 / max_rate, window=("kaiser", 5.0))
+    h *= up
+
+    # Pad the front so output samples line up with the center of the filter
+    n_pre_pad = down - (half_len % down)
+    h = np.concatenate((np.zeros(n_pre_pad), h))
+    n_pre_remove = (half_len + n_pre_pad) // down
+
+    return h, n_pre_remove
+
+
+def resample(audio_np, rate, framerate):
+    """Resample int16 audio from framerate to rate with a cached filter."""
+    g = gcd(rate, framerate)
+    up, down = rate // g, framerate // g
+    h, n_pre_remove = _get_poly_filter(up, down)
+
+    n_out = (len(audio_np) * up) // down + bool((len(audio_np) * up) % down)
+    resampled = scipy.signal.upfirdn(h, audio_np, up, down)
+    resampled = resampled[n_pre_remove : n_pre_remove + n_out]
+    if len(resampled) < n_out:
+        resampled = np.pad(resampled, (0, n_out - len(resampled)))
+
+    return resampled.astype(np.int16)
+
+
 # Function to synthesize speech and save to WAV
 def synthesize_speech(text, filename, rate=16000):
     # Save synthesized speech to a temp WAV file with default format (likely 44.1kHz stereo)
@@ -23,18 +60,29 @@ def synthesize_speech(text, filename, rate=16000):
         nchannels = wf.getnchannels()
         sampwidth = wf.getsampwidth()
         framerate = wf.getframerate()
-        nframes = wf.getnframes()
-        audio_data = wf.readframes(nframes)
-        audio_np = np.frombuffer(audio_data, dtype=np.int16)
-
-        # If stereo, convert to mono by averaging channels
-        if nchannels == 2:
-            audio_np = audio_np.reshape(-1, 2)
-            audio_np = audio_np.mean(axis=1).astype(np.int16)
-
-        # Resample if needed
-        if framerate != rate:
-            audio_np = scipy.signal.resample_poly(audio_np, rate, framerate).astype(np.int16)
+
+        # Skip decoding and re-encoding when the engine already wrote the target format
+        already_converted = (nchannels == 1) and (sampwidth == 2) and (framerate == rate)
+        if not already_converted:
+            audio_data = wf.readframes(wf.getnframes())
+
+    if already_converted:
+        # Copy rather than rename, since the temp dir may be on another filesystem
+        # and the copy gets normal permissions instead of the temp file's 0600
+        shutil.copyfile(tmp_filename, filename)
+        os.remove(tmp_filename)
+        return
+
+    audio_np = np.frombuffer(audio_data, dtype=np.int16)
+
+    # If stereo, convert to mono by averaging channels (in int32 to avoid overflow)
+    if nchannels == 2:
+        stereo = audio_np.reshape(-1, 2).astype(np.int32)
+        audio_np = ((stereo[:, 0] + stereo[:, 1]) >> 1).astype(np.int16)
+
+    # Resample if needed
+    if framerate != rate:
+        audio_np = resample(audio_np, rate, framerate)
 
     # Save new WAV with desired properties
     with wave.open(filename, 'wb') as out_wav:
@@ -1,6 +1,10 @@
 import asyncio
 from typing import Optional
 
+# Debug buffer is trimmed to the last _KEEP_BUFFER bytes past _MAX_BUFFER
+_MAX_BUFFER = 131072
+_KEEP_BUFFER = 65536
+
 
 class TeeStreamReader:
     def __init__(self, reader: asyncio.StreamReader, debug: bool = True):
@@ -11,15 +15,15 @@ class TeeStreamReader:
     # Forwarded methods with tee behavior
     async def readline(self) -> bytes:
         line = await self._reader.readline()
-        self._buffer.extend(line)
         if self._debug:
+            self._record(line)
             print(f"[DEBUG] readline: {line.decode(errors='replace').strip()}")
         return line
 
     async def readexactly(self, n: int) -> bytes:
         data = await self._reader.readexactly(n)
-        self._buffer.extend(data)
         if self._debug:
+            self._record(data)
             preview = data[:50]
             suffix = b"..." if len(data) > 50 else b""
             print(f"[DEBUG] readexactly({n}): {preview}{suffix}")
@@ -27,8 +31,8 @@ class TeeStreamReader:
 
     async def read(self, n: int = -1) -> bytes:
         data = await self._reader.read(n)
-        self._buffer.extend(data)
         if self._debug:
+            self._record(data)
             preview = data[:50]
             suffix = b"..." if len(data) > 50 else b""
             print(f"[DEBUG] read({n}): {preview}{suffix}")
@@ -36,8 +40,8 @@ class TeeStreamReader:
 
     async def readuntil(self, separator: bytes = b'\n') -> bytes:
         data = await self._reader.readuntil(separator)
-        self._buffer.extend(data)
         if self._debug:
+            self._record(data)
             print(f"[DEBUG] readuntil({separator}): {data.decode(errors='replace').strip()}")
         return data
 
@@ -48,8 +52,15 @@ class TeeStreamReader:
         return self._reader.exception()
 
     def get_debug_buffer(self) -> bytes:
+        if not self._debug:
+            return b""
         return bytes(self._buffer)
 
+    def _record(self, data: bytes) -> None:
+        self._buffer.extend(data)
+        if len(self._buffer) > _MAX_BUFFER:
+            del self._buffer[:-_KEEP_BUFFER]
+
     # Optionally: expose the underlying transport for advanced use
     def get_transport(self):
         return self._reader._transport
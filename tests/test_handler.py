@@ -0,0 +1,123 @@
+import argparse
+import asyncio
+import random
+import struct
+from pathlib import Path
+from typing import List
+
+import pvporcupine
+import pytest
+from wyoming.audio import AudioChunk, AudioStart, AudioStop
+from wyoming.event import Event
+from wyoming.info import Info
+from wyoming.wake import Detect, Detection
+
+from wyoming_porcupine.handler import Detector, Keyword, PorcupineEventHandler, State
+
+_KEYWORD_NAME = "test keyword"
+_SENSITIVITY = 0.5
+_FRAME_LENGTH = 512
+_NUM_FRAMES = 150  # enough audio to compact the handler's buffer
+_DETECTION_FRAME = 42
+
+
+class FakePorcupine:
+    """Stands in for pvporcupine.Porcupine, recording the frames it's fed."""
+
+    PicovoiceStatuses = pvporcupine.Porcupine.PicovoiceStatuses
+    frame_length = _FRAME_LENGTH
+
+    def __init__(self) -> None:
+        self._handle = object()
+        self.frames: List[List[int]] = []
+
+    def _process_func(self, handle, pcm, keyword_index_ref) -> object:
+        assert handle is self._handle
+        self.frames.append(list(pcm))
+
+        # Detect on exactly one frame
+        is_detection = len(self.frames) == (_DETECTION_FRAME + 1)
+        keyword_index_ref._obj.value = 0 if is_detection else -1
+
+        return self.PicovoiceStatuses.SUCCESS
+
+
+class RecordingEventHandler(PorcupineEventHandler):
+    """Keeps events sent to the client instead of writing them."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.sent_events: List[Event] = []
+
+    async def write_event(self, event: Event) -> None:
+        self.sent_events.append(event)
+
+
+@pytest.mark.asyncio
+async def test_audio_frames() -> None:
+    """Test that audio chunks of random sizes reach porcupine as whole frames, in order."""
+    porcupine = FakePorcupine()
+    state = State(
+        pv_lib_paths={"en": Path("porcupine_params_en.pv")},
+        keywords={
+            _KEYWORD_NAME: Keyword(
+                language="en", name=_KEYWORD_NAME, model_path=Path("test.ppn")
+            )
+        },
+    )
+
+    # Cached detector is used instead of loading one with an access key
+    state.detector_cache[state.detector_key(_KEYWORD_NAME, _SENSITIVITY)].append(
+        Detector(porcupine, _SENSITIVITY)
+    )
+
+    handler = RecordingEventHandler(
+        Info().event(),
+        argparse.Namespace(sensitivity=_SENSITIVITY, access_key=""),
+        state,
+        asyncio.StreamReader(),
+        None,
+    )
+
+    rng = random.Random(1234)
+    num_samples = (_NUM_FRAMES * _FRAME_LENGTH) + (_FRAME_LENGTH // 3)
+    samples = [rng.randint(-32768, 32767) for _ in range(num_samples)]
+    audio = struct.pack(f"<{num_samples}h", *samples)
+
+    await handler.handle_event(Detect(names=[_KEYWORD_NAME]).event())
+    await handler.handle_event(AudioStart(rate=16000, width=2, channels=1).event())
+
+    audio_offset = 0
+    while audio_offset < len(audio):
+        # Odd sizes split both frames and samples across chunks
+        chunk_size = rng.randint(1, 3 * _FRAME_LENGTH)
+        await handler.handle_event(
+            AudioChunk(
+                rate=16000,
+                width=2,
+                channels=1,
+                audio=audio[audio_offset : audio_offset + chunk_size],
+            ).event()
+        )
+        audio_offset += chunk_size
+
+    await handler.handle_event(AudioStop().event())
+
+    # Every complete frame exactly once, in order; the trailing partial frame is held
+    assert len(porcupine.frames) == _NUM_FRAMES
+    for frame_idx, frame in enumerate(porcupine.frames):
+        frame_start = frame_idx * _FRAME_LENGTH
+        assert frame == samples[frame_start : frame_start + _FRAME_LENGTH], frame_idx
+
+    detections = [
+        Detection.from_event(event)
+        for event in handler.sent_events
+        if Detection.is_type(event.type)
+    ]
+    assert len(detections) == 1
+    assert detections[0].name == _KEYWORD_NAME
+
+    # Detector goes back to the cache
+    await handler.disconnect()
+    cached = state.detector_cache[state.detector_key(_KEYWORD_NAME, _SENSITIVITY)]
+    assert [d.porcupine for d in cached] == [porcupine]
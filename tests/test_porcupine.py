@@ -1,14 +1,17 @@
 import asyncio
+import io
+import mmap
+import struct
 import sys
-import wave
 import socket
 from asyncio.subprocess import PIPE
 from pathlib import Path
+from typing import List, Tuple
 import os
 
 import pytest
-from wyoming.audio import AudioStart, AudioStop, wav_to_chunks
-from wyoming.event import async_read_event, async_write_event
+from wyoming.audio import AudioChunk, AudioStart, AudioStop
+from wyoming.event import Event, async_read_event, async_write_event, write_event
 from wyoming.info import Describe, Info
 from wyoming.wake import Detect, Detection, NotDetected
 from tees_stream_reader import TeeStreamReader
@@ -18,6 +21,82 @@ _SAMPLES_PER_CHUNK = 1024
 _DETECTION_TIMEOUT = 10
 _TCP_PORT = 0  # 0 means the OS will assign a free port
 
+
+def _serialize_event(event: Event) -> bytes:
+    """Serialize an event with wyoming's own writer."""
+    with io.BytesIO() as buffer:
+        write_event(event, buffer)
+        return buffer.getvalue()
+
+
+def _mmap_wav_chunks(
+    wav_path: Path, samples_per_chunk: int
+) -> Tuple[AudioStart, List[AudioChunk]]:
+    """Read a PCM WAV file's format and split it into chunks via a memory map."""
+    with open(wav_path, "rb") as wav_file, mmap.mmap(
+        wav_file.fileno(), 0, access=mmap.ACCESS_READ
+    ) as wav_mmap, memoryview(wav_mmap) as wav_view:
+        assert wav_view[0:4] == b"RIFF" and wav_view[8:12] == b"WAVE", wav_path
+
+        # Walk the RIFF chunks for the format and the start of the samples
+        rate = width = channels = 0
+        offset = 12
+        while offset + 8 <= len(wav_view):
+            chunk_id = bytes(wav_view[offset : offset + 4])
+            (chunk_size,) = struct.unpack_from("<I", wav_view, offset + 4)
+            offset += 8
+            if chunk_id == b"fmt ":
+                channels, rate = struct.unpack_from("<HI", wav_view, offset + 2)
+                (bits_per_sample,) = struct.unpack_from("<H", wav_view, offset + 14)
+                width = bits_per_sample // 8
+            elif chunk_id == b"data":
+                break
+
+            # Chunks are padded to an even size
+            offset += chunk_size + (chunk_size % 2)
+        else:
+            raise ValueError(f"No data in {wav_path}")
+
+        assert width > 0, f"No format before data in {wav_path}"
+        audio_start = AudioStart(rate=rate, width=width, channels=channels)
+
+        # Drop any trailing partial sample frame so chunks hold whole frames
+        block_align = width * channels
+        data_size = min(chunk_size, len(wav_view) - offset)
+        data_end = offset + (data_size - (data_size % block_align))
+        bytes_per_chunk = samples_per_chunk * block_align
+        chunks: List[AudioChunk] = []
+        timestamp = 0
+        for chunk_start in range(offset, data_end, bytes_per_chunk):
+            # Only the copy into the chunk itself is needed by the event API
+            chunk = AudioChunk(
+                rate=rate,
+                width=width,
+                channels=channels,
+                audio=bytes(
+                    wav_view[chunk_start : min(chunk_start + bytes_per_chunk, data_end)]
+                ),
+                timestamp=timestamp,
+            )
+            chunks.append(chunk)
+            timestamp += chunk.milliseconds
+
+    return audio_start, chunks
+
+
+async def _write_wav(wav_path: Path, writer) -> None:
+    """Send a WAV file as audio-start, chunks, and audio-stop in a single write."""
+    audio_start, chunks = _mmap_wav_chunks(wav_path, _SAMPLES_PER_CHUNK)
+    events = [
+        audio_start.event(),
+        *(chunk.event() for chunk in chunks),
+        AudioStop().event(),
+    ]
+
+    writer.write(b"".join(_serialize_event(event) for event in events))
+    await writer.drain()
+
+
 #Commentout the WYOMING_TEST_PORT set when not testing with server side
 #os.environ["WYOMING_TEST_PORT"] = "9899"
 @pytest.mark.asyncio
@@ -147,19 +226,7 @@ async def test_porcupine() -> None:
         await async_write_event(Detect(names=["ok home"]).event(), writer)
 
         # Test positive WAV
-        with wave.open(str(_DIR / "ok_home_gen.wav"), "rb") as ok_home_wav:
-            await async_write_event(
-                AudioStart(
-                    rate=ok_home_wav.getframerate(),
-                    width=ok_home_wav.getsampwidth(),
-                    channels=ok_home_wav.getnchannels(),
-                ).event(),
-                writer,
-            )
-            for chunk in wav_to_chunks(ok_home_wav, _SAMPLES_PER_CHUNK):
-                await async_write_event(chunk.event(), writer)
-
-        await async_write_event(AudioStop().event(), writer)
+        await _write_wav(_DIR / "ok_home_gen.wav", writer)
 
         while True:
             event = await asyncio.wait_for(
@@ -177,19 +244,7 @@ async def test_porcupine() -> None:
             break
 
         # Test negative WAV
-        with wave.open(str(_DIR / "snowboy.wav"), "rb") as snowboy_wav:
-            await async_write_event(
-                AudioStart(
-                    rate=snowboy_wav.getframerate(),
-                    width=snowboy_wav.getsampwidth(),
-                    channels=snowboy_wav.getnchannels(),
-                ).event(),
-                writer,
-            )
-            for chunk in wav_to_chunks(snowboy_wav, _SAMPLES_PER_CHUNK):
-                await async_write_event(chunk.event(), writer)
-
-        await async_write_event(AudioStop().event(), writer)
+        await _write_wav(_DIR / "snowboy.wav", writer)
 
         while True:
             event = await asyncio.wait_for(async_read_event(tee_reader), timeout=1)
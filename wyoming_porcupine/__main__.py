@@ -2,11 +2,12 @@
 import argparse
 import asyncio
 import logging
+import os
 import platform
-from functools import partial
+import re
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import Dict
-import json
+from typing import Dict, Iterator, Union
 from .handler import Keyword, PorcupineEventHandler, State
 
 from wyoming.info import Attribution, Info, WakeModel, WakeProgram
@@ -15,6 +16,47 @@ from wyoming.server import AsyncServer
 _LOGGER = logging.getLogger()
 _DIR = Path(__file__).parent
 
+# Built-in keywords, files are of the form mykeyword_linux.ppn
+_KEYWORD_STEM = re.compile(r"(?P<name>.+)_(?P<system>[^_]+)")
+
+# Custom keywords, files are of the form mykeyword_en_linux_v2_2_0.ppn
+_CUSTOM_KEYWORD_STEM = re.compile(
+    r"(?P<name>[^_]+)_(?P<language>[^_]+)_(?P<system>[^_]+)_.*"
+)
+
+
+def _find_ppn(
+    root: Union[str, Path], recursive: bool = False
+) -> Iterator["os.DirEntry[str]"]:
+    """Yield .ppn files in root without creating a Path for every entry."""
+    try:
+        entries = os.scandir(root)
+    except OSError:
+        # Missing or unreadable directories are skipped, like Path.glob
+        return
+
+    with entries:
+        for entry in entries:
+            if entry.name.endswith(".ppn") and entry.is_file():
+                yield entry
+            elif recursive and entry.is_dir(follow_symlinks=False):
+                # Symlinked directories aren't followed, like Path.rglob
+                yield from _find_ppn(entry.path, recursive=True)
+
+
+@lru_cache(maxsize=None)
+def _wake_model(name: str, language: str) -> WakeModel:
+    """Describe a keyword for Wyoming info, built once per name and language."""
+    return WakeModel(
+        name=name,
+        description=f"{name} ({language})",
+        attribution=Attribution(
+            name="Picovoice",
+            url="https://github.com/Picovoice/porcupine",
+        ),
+        installed=True,
+        languages=[language],
+    )
 
 
 async def main() -> None:
@@ -58,33 +100,41 @@ async def main() -> None:
 
     # name -> keyword
     keywords: Dict[str, Keyword] = {}
-    for kw_path in (args.data_dir / "resources").rglob("*.ppn"):
-        kw_system = kw_path.stem.split("_")[-1]
-        if kw_system != args.system:
+    for kw_entry in _find_ppn(args.data_dir / "resources", recursive=True):
+        kw_match = _KEYWORD_STEM.fullmatch(kw_entry.name[: -len(".ppn")])
+        if (kw_match is None) or (kw_match["system"] != args.system):
             continue
 
+        kw_path = Path(kw_entry.path)
         kw_lang = kw_path.parent.parent.name
-        kw_name = kw_path.stem.rsplit("_", maxsplit=1)[0]
+        kw_name = kw_match["name"]
         keywords[kw_name] = Keyword(language=kw_lang, name=kw_name, model_path=kw_path)
 
-    # custom models, files are of the form mykeyword_en_linux_v2_2_0.ppn
+    # custom models
     for dir in args.custom_keyword_dir:
-        for kw_path in dir.glob("*.ppn"):
-            try:
-                (kw_name, kw_lang, kw_system, _) = kw_path.stem.split("_", maxsplit=3)
-            except:
-                _LOGGER.warning("Incorrect keyword filename (%s), ignoring", kw_path)
+        for kw_entry in _find_ppn(dir):
+            kw_match = _CUSTOM_KEYWORD_STEM.fullmatch(kw_entry.name[: -len(".ppn")])
+            if kw_match is None:
+                _LOGGER.warning(
+                    "Incorrect keyword filename (%s), ignoring", kw_entry.path
+                )
                 continue
 
+            kw_name, kw_lang, kw_system = kw_match.group("name", "language", "system")
             if kw_system != args.system:
-                _LOGGER.warning("Incorrect keyword system (%s), ignoring", kw_path)
+                _LOGGER.warning(
+                    "Incorrect keyword system (%s), ignoring", kw_entry.path
+                )
                 continue
 
             keywords[kw_name] = Keyword(
-                language=kw_lang, name=kw_name, model_path=kw_path
+                language=kw_lang, name=kw_name, model_path=Path(kw_entry.path)
             )
-            
-    print(f"Found {len(keywords)} keywords: {json.dumps(keywords, indent=2, default=str)}")
+
+    _LOGGER.info("Found %s keyword(s)", len(keywords))
+    if _LOGGER.isEnabledFor(logging.DEBUG):
+        _LOGGER.debug("Keywords: %s", list(keywords))
+
     wyoming_info = Info(
         wake=[
             WakeProgram(
@@ -94,23 +144,14 @@ async def main() -> None:
                     name="Picovoice", url="https://github.com/Picovoice/porcupine"
                 ),
                 installed=True,
-                models=[
-                    WakeModel(
-                        name=kw.name,
-                        description=f"{kw.name} ({kw.language})",
-                        attribution=Attribution(
-                            name="Picovoice",
-                            url="https://github.com/Picovoice/porcupine",
-                        ),
-                        installed=True,
-                        languages=[kw.language],
-                    )
-                    for kw in keywords.values()
-                ],
+                models=[_wake_model(kw.name, kw.language) for kw in keywords.values()],
             )
         ],
     )
 
+    # Built once and shared by every client connection
+    wyoming_info_event = wyoming_info.event()
+
     state = State(pv_lib_paths=pv_lib_paths, keywords=keywords)
 
     _LOGGER.info("Ready")
@@ -121,7 +162,9 @@ async def main() -> None:
     server = AsyncServer.from_uri(args.uri)
 
     try:
-        await server.run(partial(PorcupineEventHandler, wyoming_info, args, state))
+        await server.run(
+            partial(PorcupineEventHandler, wyoming_info_event, args, state)
+        )
     except KeyboardInterrupt:
         pass
 
@@ -1,18 +1,19 @@
 #!/usr/bin/env python3
 import argparse
 import asyncio
+import ctypes
+import itertools
 import logging
-import struct
-import time
-from collections import defaultdict
+from collections import defaultdict, deque
 from dataclasses import dataclass
+from functools import partial
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Deque, Dict, List, Optional, Tuple
 
 import pvporcupine
 from wyoming.audio import AudioChunk, AudioChunkConverter, AudioStart, AudioStop
 from wyoming.event import Event
-from wyoming.info import Describe, Info
+from wyoming.info import Describe
 from wyoming.server import AsyncEventHandler
 from wyoming.wake import Detect, Detection, NotDetected
 
@@ -22,6 +23,9 @@ _DIR = Path(__file__).parent
 
 DEFAULT_KEYWORD = "porcupine"
 
+# Consumed bytes are only dropped from the audio buffer past this offset
+_COMPACT_OFFSET = 65536
+
 
 @dataclass
 class Keyword:
@@ -45,10 +49,15 @@ class State:
         self.pv_lib_paths = pv_lib_paths
         self.keywords = keywords
 
-        # keyword name -> [detector]
-        self.detector_cache: Dict[str, List[Detector]] = defaultdict(list)
+        # (keyword name, sensitivity key) -> [detector]
+        self.detector_cache: Dict[Tuple[str, int], Deque[Detector]] = defaultdict(deque)
         self.detector_lock = asyncio.Lock()
 
+    @staticmethod
+    def detector_key(keyword_name: str, sensitivity: float) -> Tuple[str, int]:
+        """Cache key for detectors, with sensitivity bucketed to 0.001."""
+        return (keyword_name, round(sensitivity * 1000))
+
     async def get_porcupine(
         self, keyword_name: str, sensitivity: float, access_key: str
     ) -> Detector:
@@ -58,28 +67,33 @@ class State:
 
         # Check cache first for matching detector
         async with self.detector_lock:
-            detectors = self.detector_cache.get(keyword_name)
+            detectors = self.detector_cache.get(
+                self.detector_key(keyword_name, sensitivity)
+            )
             if detectors:
-                detector = next(
-                    (d for d in detectors if d.sensitivity == sensitivity), None
-                )
-                if detector is not None:
-                    # Remove from cache for use
-                    detectors.remove(detector)
+                # Remove from cache for use
+                detector = detectors.popleft()
 
-                    _LOGGER.debug(
-                        "Using detector for %s from cache (%s)",
-                        keyword_name,
-                        len(detectors),
-                    )
-                    return detector
+                _LOGGER.debug(
+                    "Using detector for %s from cache (%s)",
+                    keyword_name,
+                    len(detectors),
+                )
+                return detector
 
+        # Loading reads model files and initializes the runtime, so it's done
+        # off the event loop. Each client gets its own instance.
         _LOGGER.debug("Loading %s for %s", keyword.name, keyword.language)
-        porcupine = pvporcupine.create(
-            model_path=str(self.pv_lib_paths[keyword.language]),
-            keyword_paths=[str(keyword.model_path)],
-            sensitivities=[sensitivity],
-            access_key=access_key,
+        loop = asyncio.get_running_loop()
+        porcupine = await loop.run_in_executor(
+            None,
+            partial(
+                pvporcupine.create,
+                model_path=str(self.pv_lib_paths[keyword.language]),
+                keyword_paths=[str(keyword.model_path)],
+                sensitivities=[sensitivity],
+                access_key=access_key,
+            ),
         )
 
         return Detector(porcupine, sensitivity)
@@ -91,9 +105,11 @@ class State:
 class PorcupineEventHandler(AsyncEventHandler):
     """Event handler for clients."""
 
+    _client_ids = itertools.count()
+
     def __init__(
         self,
-        wyoming_info: Info,
+        wyoming_info_event: Event,
         cli_args: argparse.Namespace,
         state: State,
         *args,
@@ -102,17 +118,20 @@ class PorcupineEventHandler(AsyncEventHandler):
         super().__init__(*args, **kwargs)
 
         self.cli_args = cli_args
-        self.wyoming_info_event = wyoming_info.event()
-        self.client_id = str(time.monotonic_ns())
+        self.wyoming_info_event = wyoming_info_event
+        self.client_id = next(PorcupineEventHandler._client_ids)
         self.state = state
         self.converter = AudioChunkConverter(rate=16000, width=2, channels=1)
-        self.audio_buffer = bytes()
+        self.audio_buffer = bytearray()
+        self.audio_offset = 0
         self.detected = False
 
         self.detector: Optional[Detector] = None
         self.keyword_name: str = ""
-        self.chunk_format: str = ""
+        self.frame_length: int = 0
         self.bytes_per_chunk: int = 0
+        self.frame_buffer: ctypes.Array = (ctypes.c_int16 * 0)()
+        self.keyword_index = ctypes.c_int()
 
         _LOGGER.debug("Client connected: %s", self.client_id)
 
@@ -137,15 +156,36 @@ class PorcupineEventHandler(AsyncEventHandler):
             assert self.detector is not None
 
             chunk = AudioChunk.from_event(event)
-            chunk = self.converter.convert(chunk)
-            self.audio_buffer += chunk.audio
-
-            while len(self.audio_buffer) >= self.bytes_per_chunk:
-                unpacked_chunk = struct.unpack_from(
-                    self.chunk_format, self.audio_buffer[: self.bytes_per_chunk]
+            if (
+                (chunk.rate != self.converter.rate)
+                or (chunk.width != self.converter.width)
+                or (chunk.channels != self.converter.channels)
+            ):
+                # Most clients already send 16kHz 16-bit mono
+                chunk = self.converter.convert(chunk)
+
+            if self.audio_offset > _COMPACT_OFFSET:
+                # Drop consumed audio once enough has built up
+                del self.audio_buffer[: self.audio_offset]
+                self.audio_offset = 0
+
+            self.audio_buffer.extend(chunk.audio)
+
+            # Only complete frames are fed to porcupine
+            num_frames = (
+                len(self.audio_buffer) - self.audio_offset
+            ) // self.bytes_per_chunk
+            frames_end = self.audio_offset + (num_frames * self.bytes_per_chunk)
+
+            if num_frames > 0:
+                # Process the whole batch of frames in one trip off the event loop
+                loop = asyncio.get_running_loop()
+                keyword_indexes = await loop.run_in_executor(
+                    None, self._process_frames, self.audio_offset, frames_end
                 )
-                keyword_index = self.detector.porcupine.process(unpacked_chunk)
-                if keyword_index >= 0:
+                self.audio_offset = frames_end
+
+                for _keyword_index in keyword_indexes:
                     _LOGGER.debug(
                         "Detected %s from client %s", self.keyword_name, self.client_id
                     )
@@ -155,8 +195,6 @@ class PorcupineEventHandler(AsyncEventHandler):
                         ).event()
                     )
 
-                self.audio_buffer = self.audio_buffer[self.bytes_per_chunk :]
-
         elif AudioStop.is_type(event.type):
             # Inform client if not detections occurred
             if not self.detected:
@@ -178,13 +216,17 @@ class PorcupineEventHandler(AsyncEventHandler):
 
         if self.detector is not None:
             # Return detector to cache
+            detector_key = self.state.detector_key(
+                self.keyword_name, self.detector.sensitivity
+            )
             async with self.state.detector_lock:
-                self.state.detector_cache[self.keyword_name].append(self.detector)
+                detectors = self.state.detector_cache[detector_key]
+                detectors.append(self.detector)
                 self.detector = None
                 _LOGGER.debug(
                     "Detector for %s returned to cache (%s)",
                     self.keyword_name,
-                    len(self.state.detector_cache[self.keyword_name]),
+                    len(detectors),
                 )
 
     async def _load_keyword(self, keyword_name: str):
@@ -192,8 +234,46 @@ class PorcupineEventHandler(AsyncEventHandler):
             keyword_name, self.cli_args.sensitivity, self.cli_args.access_key
         )
         self.keyword_name = keyword_name
-        self.chunk_format = "h" * self.detector.porcupine.frame_length
-        self.bytes_per_chunk = self.detector.porcupine.frame_length * 2
+        self.frame_length = self.detector.porcupine.frame_length
+        self.bytes_per_chunk = self.frame_length * 2
+        self.frame_buffer = (ctypes.c_int16 * self.frame_length)()
+
+    def _process_frames(self, frames_start: int, frames_end: int) -> List[int]:
+        """Feed buffered frames to porcupine in an executor, returning detections."""
+        assert self.detector is not None
+        porcupine = self.detector.porcupine
+
+        # Porcupine.process() copies every frame into a new C array, so the
+        # native function it wraps is called with the reusable frame buffer.
+        # pylint: disable=protected-access
+        process_func = porcupine._process_func
+        porcupine_handle = porcupine._handle
+        keyword_index_ref = ctypes.byref(self.keyword_index)
+
+        keyword_indexes: List[int] = []
+        for frame_offset in range(frames_start, frames_end, self.bytes_per_chunk):
+            # Copy the next frame into the reusable sample buffer
+            ctypes.memmove(
+                self.frame_buffer,
+                (ctypes.c_char * self.bytes_per_chunk).from_buffer(
+                    self.audio_buffer, frame_offset
+                ),
+                self.bytes_per_chunk,
+            )
+            status = process_func(
+                porcupine_handle, self.frame_buffer, keyword_index_ref
+            )
+            if status is not porcupine.PicovoiceStatuses.SUCCESS:
+                # Same error reporting as Porcupine.process()
+                raise porcupine._PICOVOICE_STATUS_TO_EXCEPTION[status](
+                    message="Processing failed",
+                    message_stack=porcupine._get_error_stack(),
+                )
+
+            if self.keyword_index.value >= 0:
+                keyword_indexes.append(self.keyword_index.value)
+
+        return keyword_indexes
 
 
 # -----------------------------------------------------------------------------